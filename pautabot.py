@@ -1,24 +1,38 @@
+import codecs
+from concurrent.futures import ThreadPoolExecutor
 import dataclasses
-from datetime import datetime
+from datetime import date, datetime
+import functools
+import json
 import logging
 import os
 import pickle
+import random
+import re
 import tempfile
 from typing import Dict, List, Optional, Set, Tuple
 import sys
+import time
 
 import click
 import dotenv
-from dataclasses_json import dataclass_json
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 import shutil
 import tweepy
+from urllib3.util.retry import Retry
 
-STATE_FILE = "pautabot.state"
-BIGNUM = 9e15
+STATE_FILE = "pautabot.state"  # legacy pickled state, only read to migrate
+STATE_META_FILE = "pautabot.meta.json"
+STATE_LOG_FILE = "pautabot.log.jsonl"
 CURRENT_YEAR = datetime.now().year
 
 KEYWORD_TO_CHECK = "publicidad"
+KEYWORD_RE = re.compile(re.escape(KEYWORD_TO_CHECK), re.IGNORECASE)
+DETAIL_FETCH_WORKERS = 8
+SCREENSHOT_FETCH_WORKERS = 4
+MICROLINK_MAX_ATTEMPTS = 5
 
 AD_PURCHASES_URL = f"https://gobiernoabierto.bahia.gob.ar/WS/2328/{CURRENT_YEAR}"
 ALL_PURCHASES_URL = f"https://gobiernoabierto.bahia.gob.ar/WS/2307/{CURRENT_YEAR}"
@@ -40,27 +54,34 @@ TWEET_TEMPLATE = """
 {url}
 """
 
-BOLD_TRANS = str.maketrans(
-    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!?.,\"'",
-    "𝐚𝐛𝐜𝐝𝐞𝐟𝐠𝐡𝐢𝐣𝐤𝐥𝐦𝐧𝐨𝐩𝐪𝐫𝐬𝐭𝐮𝐯𝐰𝐱𝐲𝐳𝐀𝐁𝐂𝐃𝐄𝐅𝐆𝐇𝐈𝐉𝐊𝐋𝐌𝐍𝐎𝐏𝐐𝐑𝐒𝐓𝐔𝐕𝐖𝐗𝐘𝐙𝟎𝟏𝟐𝟑𝟒𝟓𝟔𝟕𝟖𝟗❗❓.,\"'",
-)
 
-DIGIT_TRANS = str.maketrans("1234567890", "𝟭𝟮𝟯𝟰𝟱𝟲𝟳𝟴𝟵𝟬")
+@functools.lru_cache(maxsize=None)
+def bold_trans() -> Dict[int, int]:
+    return str.maketrans(
+        "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!?.,\"'",
+        "𝐚𝐛𝐜𝐝𝐞𝐟𝐠𝐡𝐢𝐣𝐤𝐥𝐦𝐧𝐨𝐩𝐪𝐫𝐬𝐭𝐮𝐯𝐰𝐱𝐲𝐳𝐀𝐁𝐂𝐃𝐄𝐅𝐆𝐇𝐈𝐉𝐊𝐋𝐌𝐍𝐎𝐏𝐐𝐑𝐒𝐓𝐔𝐕𝐖𝐗𝐘𝐙𝟎𝟏𝟐𝟑𝟒𝟓𝟔𝟕𝟖𝟗❗❓.,\"'",
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def digit_trans() -> Dict[int, int]:
+    return str.maketrans("1234567890", "𝟭𝟮𝟯𝟰𝟱𝟲𝟳𝟴𝟵𝟬")
 
 
+@functools.lru_cache(maxsize=2048)
 def boldify(s: str) -> str:
     """
     >>> boldify("Gran inversion, 65 palos para adornar periodistas")
     '𝐆𝐫𝐚𝐧 𝐢𝐧𝐯𝐞𝐫𝐬𝐢𝐨𝐧, 𝟔𝟓 𝐩𝐚𝐥𝐨𝐬 𝐩𝐚𝐫𝐚 𝐚𝐝𝐨𝐫𝐧𝐚𝐫 𝐩𝐞𝐫𝐢𝐨𝐝𝐢𝐬𝐭𝐚𝐬'
     """
-    return s.translate(BOLD_TRANS)
+    return s.translate(bold_trans())
 
 
+@functools.lru_cache(maxsize=2048)
 def monodigits(s: str) -> str:
-    return s.translate(DIGIT_TRANS)
+    return s.translate(digit_trans())
 
 
-@dataclass_json
 @dataclasses.dataclass
 class Purchase:
     ejercicio: int
@@ -83,8 +104,18 @@ class ProcessedPurchase(Purchase):
 class RunState:
     last_run: datetime
     totals_by_seller: Dict[str, float]
-    all_purchases: List[Purchase]
     processed_purchases: List[ProcessedPurchase]
+    # how many of processed_purchases are already in STATE_LOG_FILE
+    logged_purchases: int = 0
+    # (ejercicio, ordencompra) of every processed purchase
+    processed_keys: Set[Tuple[int, int]] = dataclasses.field(default_factory=set)
+
+
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_maxsize=16, max_retries=Retry(total=3, backoff_factor=0.3)),
+)
 
 
 logger = logging.getLogger("pautabot")
@@ -112,56 +143,107 @@ def init_twitter_client() -> tweepy.API:
 
 
 def get_microlink_screenshot(url: str) -> str:
-    resp = requests.get(
-        "https://api.microlink.io/",
-        params={
-            "url": url,
-            "screenshot": "",
-            "element": "table",
-            "viewport.width": 1024,
-            "styles": "table { margin: 10px !important }"
-        },
-    )
-    j = resp.json()
-    if j.get("status") == "fail" and j.get("code") == "ECNRCY":
-        # concurrency error, try again
-        # TODO: set max number of retries
-        logger.info("Microlink throttled. Retrying in 2 secs...")
-        time.sleep(2)
-        return get_microlink_screenshot(url)
-    else:
-        url = j["data"]["screenshot"]["url"]
-        resp = requests.get(url, stream=True)
+    for attempt in range(1, MICROLINK_MAX_ATTEMPTS + 1):
+        resp = SESSION.get(
+            "https://api.microlink.io/",
+            params={
+                "url": url,
+                "screenshot": "",
+                "element": "table",
+                "viewport.width": 1024,
+                "styles": "table { margin: 10px !important }"
+            },
+        )
+        j = resp.json()
+        if not (j.get("status") == "fail" and j.get("code") == "ECNRCY"):
+            break
+        if attempt == MICROLINK_MAX_ATTEMPTS:
+            raise RuntimeError(
+                f"Microlink throttled {MICROLINK_MAX_ATTEMPTS} times for {url}"
+            )
+        # concurrency error, back off with jitter so that concurrent
+        # fetches don't retry in lockstep
+        delay = 2 * attempt + random.uniform(0, 2)
+        logger.info("Microlink throttled. Retrying in %.1f secs...", delay)
+        time.sleep(delay)
+
+    screenshot_url = j["data"]["screenshot"]["url"]
+    resp = SESSION.get(screenshot_url, stream=True)
 
-        fp, fname = tempfile.mkstemp(".png")
-        with open(fname, "wb") as f:
-            resp.raw.decode_content = True
-            shutil.copyfileobj(resp.raw, f)
+    fd, fname = tempfile.mkstemp(".png")
+    with resp, os.fdopen(fd, "wb") as f:
+        resp.raw.decode_content = True
+        shutil.copyfileobj(resp.raw, f, length=1 << 20)
 
-        return fname
+    return fname
 
     
+@functools.lru_cache(maxsize=None)
+def parse_fecha(fecha: str) -> date:
+    """
+    >>> parse_fecha("25-08-2020")
+    datetime.date(2020, 8, 25)
+
+    >>> parse_fecha("3-9-2020")
+    datetime.date(2020, 9, 3)
+    """
+    day, month, year = fecha.split("-")
+    return date(int(year), int(month), int(day))
+
+
 def purchase_detail_url(purchase: Purchase) -> str:
     return DETAIL_PURCHASE_URL_TEMPLATE.format(
         year=purchase.ejercicio, ordencompra=purchase.ordencompra
     )
 
 
+def is_utf8(encoding: str) -> bool:
+    """
+    >>> is_utf8("UTF8")
+    True
+
+    >>> is_utf8("ISO-8859-1")
+    False
+    """
+    try:
+        return codecs.lookup(encoding).name in ("utf-8", "utf-8-sig")
+    except LookupError:
+        return False
+
+
+def response_json(resp: requests.Response):
+    # parse the raw bytes unless the server declares a non UTF-8 charset;
+    # going through resp.text without a charset runs chardet on the body
+    if resp.encoding is None or is_utf8(resp.encoding):
+        content = resp.content
+        if content.startswith(codecs.BOM_UTF8):
+            content = content[len(codecs.BOM_UTF8) :]
+        return orjson.loads(content)
+    return orjson.loads(resp.text.lstrip("\ufeff"))
+
+
 def get_advertisement_totals_by_seller() -> Dict[str, float]:
-    resp = requests.get(AD_PURCHASES_URL)
+    resp = SESSION.get(AD_PURCHASES_URL)
     logger.info("Got totals by seller: %s", resp.text)
-    json_resp = resp.json()
+    json_resp = response_json(resp)
     return {row["proveedor"]: float(row["monto"]) for row in json_resp}
 
 
 def get_all_purchases() -> List[Purchase]:
-    resp = requests.get(ALL_PURCHASES_URL)
-    all_purchases = Purchase.schema().load(resp.json(), many=True)
-    return sorted(
-        all_purchases,
-        key=lambda p: datetime.strptime(p.fecha, "%d-%m-%Y"),
-        reverse=True,
-    )
+    resp = SESSION.get(ALL_PURCHASES_URL)
+    all_purchases = [
+        Purchase(
+            ejercicio=int(row["ejercicio"]),
+            ordencompra=int(row["ordencompra"]),
+            fecha=row["fecha"],
+            importe=float(row["importe"]),
+            proveedor=row["proveedor"],
+            dependencia=row["dependencia"],
+            expediente=row["expediente"],
+        )
+        for row in response_json(resp)
+    ]
+    return sorted(all_purchases, key=lambda p: parse_fecha(p.fecha), reverse=True)
 
 
 def diff_totals(old: Dict[str, float], new: Dict[str, float]) -> List[str]:
@@ -182,29 +264,66 @@ def diff_totals(old: Dict[str, float], new: Dict[str, float]) -> List[str]:
     sellers_to_process = [
         new_seller
         for new_seller, new_amount in new.items()
-        if old.get(new_seller, BIGNUM) < new_amount or new_seller not in old
+        if new_seller not in old or old[new_seller] < new_amount
     ]
 
     return sellers_to_process
 
 
 def get_purchase_detail(url: str) -> List[dict]:
-    resp = requests.get(url)
-    return resp.json()
+    resp = SESSION.get(url)
+    return response_json(resp)
+
+
+def check_purchase_details(
+    purchases: List[Purchase],
+) -> List[Tuple[Purchase, Optional[bool], Optional[Exception]]]:
+    """
+    Fetch the detail of every purchase concurrently and check it for
+    KEYWORD_TO_CHECK. Returns, for each purchase and in the same order,
+    either the result of the check or the exception raised while getting
+    the detail.
+    """
+
+    def check(p: Purchase):
+        logger.info("Getting detail for %s/%s", p.ejercicio, p.ordencompra)
+        try:
+            purchase_detail = get_purchase_detail(purchase_detail_url(p))
+        except Exception as e:
+            return p, None, e
+        return p, detail_has_keyword(purchase_detail), None
+
+    with ThreadPoolExecutor(max_workers=DETAIL_FETCH_WORKERS) as executor:
+        return list(executor.map(check, purchases))
+
+
+def detail_has_keyword(purchase_detail: List[dict]) -> bool:
+    """
+    >>> detail_has_keyword([{"detalle": "Resmas A4"}, {"detalle": "PUBLICIDAD radial"}])
+    True
+
+    >>> detail_has_keyword([{"detalle": "Resmas A4"}])
+    False
+    """
+    return any(KEYWORD_RE.search(line["detalle"]) for line in purchase_detail)
+
+
+def purchases_by_seller(purchases: List[Purchase]) -> Dict[str, List[Purchase]]:
+    by_seller: Dict[str, List[Purchase]] = {}
+    for p in purchases:
+        by_seller.setdefault(p.proveedor, []).append(p)
+    return by_seller
 
 
 def get_unprocessed_purchases_for_seller(
-    all_purchases: List, processed_purchases: List[ProcessedPurchase], seller: str
+    by_seller: Dict[str, List[Purchase]],
+    processed_purchases_set: Set[Tuple[int, int]],
+    seller: str,
 ) -> List[Purchase]:
-    processed_purchases_set: Set[Tuple[int, int]] = set()
-    for pp in processed_purchases:
-        processed_purchases_set.add((pp.ejercicio, pp.ordencompra))
-
     unprocessed_purchases = [
         purchase
-        for purchase in all_purchases
-        if purchase.proveedor == seller
-        and (purchase.ejercicio, purchase.ordencompra) not in processed_purchases_set
+        for purchase in by_seller.get(seller, [])
+        if (purchase.ejercicio, purchase.ordencompra) not in processed_purchases_set
     ]
 
     return unprocessed_purchases
@@ -224,18 +343,44 @@ def tweet_body_for_purchase(purchase: Purchase) -> str:
     return tweet_body
 
 
+def get_purchase_screenshot(purchase: Purchase) -> str:
+    return get_microlink_screenshot(
+        DETAIL_PURCHASE_PAGE_URL_TEMPLATE.format(
+            year=purchase.ejercicio, ordencompra=purchase.ordencompra
+        )
+    )
+
+
+def get_purchase_screenshots(purchases: List[Purchase]) -> List[Optional[str]]:
+    """
+    Fetch the screenshot of every purchase concurrently. Returns, for each
+    purchase and in the same order, the path of its screenshot or None if
+    it couldn't be fetched.
+    """
+
+    def fetch(p: Purchase) -> Optional[str]:
+        try:
+            return get_purchase_screenshot(p)
+        except Exception as e:
+            logger.warn("Error when getting screenshot of %s. Exception: %s", p, e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=SCREENSHOT_FETCH_WORKERS) as executor:
+        return list(executor.map(fetch, purchases))
+
+
 def tweet_new_purchase(
-    purchase: Purchase, twitter_client: tweepy.API, with_image: bool = True
+    purchase: Purchase,
+    twitter_client: tweepy.API,
+    with_image: bool = True,
+    screenshot_path: Optional[str] = None,
 ) -> tweepy.Status:
     status: tweepy.Status
     tweet_body = tweet_body_for_purchase(purchase)
 
     if with_image:
-        screenshot_path = get_microlink_screenshot(
-            DETAIL_PURCHASE_PAGE_URL_TEMPLATE.format(
-                year=purchase.ejercicio, ordencompra=purchase.ordencompra
-            )
-        )
+        if screenshot_path is None:
+            screenshot_path = get_purchase_screenshot(purchase)
         status = twitter_client.update_with_media(screenshot_path, status=tweet_body)
     else:
         status = twitter_client.update_status(tweet_body)
@@ -243,16 +388,119 @@ def tweet_new_purchase(
     return status
 
 
-def load_state() -> RunState:
+def processed_purchase_to_json(pp: ProcessedPurchase) -> str:
+    row = dataclasses.asdict(pp)
+    row["processed_at"] = pp.processed_at.isoformat()
+    return json.dumps(row)
+
+
+def processed_purchase_from_json(line: str) -> ProcessedPurchase:
+    row = json.loads(line)
+    row["processed_at"] = datetime.fromisoformat(row["processed_at"])
+    return ProcessedPurchase(**row)
+
+
+def load_legacy_state() -> RunState:
+    logger.info("Migrating state from %s", STATE_FILE)
     with open(STATE_FILE, "rb") as sf:
         state: RunState = pickle.load(sf)
+    # all_purchases used to be persisted, but it's refetched on every run
+    state.__dict__.pop("all_purchases", None)
+    state.logged_purchases = 0
+    state.processed_keys = {
+        (pp.ejercicio, pp.ordencompra) for pp in state.processed_purchases
+    }
     return state
 
 
+def load_state() -> RunState:
+    if not os.path.exists(STATE_META_FILE):
+        return load_legacy_state()
+
+    with open(STATE_META_FILE) as mf:
+        meta = json.load(mf)
+
+    lines: List[str] = []
+    if os.path.exists(STATE_LOG_FILE):
+        with open(STATE_LOG_FILE) as lf:
+            lines = lf.readlines()
+
+    # a crash during an append can leave the last line unfinished
+    torn_tail = len(lines) > 0 and not lines[-1].endswith("\n")
+
+    processed_purchases: List[ProcessedPurchase] = []
+    processed_keys: Set[Tuple[int, int]] = set()
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            pp = processed_purchase_from_json(line)
+        except ValueError:
+            if i < len(lines) - 1:
+                raise
+            logger.warn("Ignoring torn last line of %s: %r", STATE_LOG_FILE, line)
+            torn_tail = True
+            continue
+        processed_purchases.append(pp)
+        processed_keys.add((pp.ejercicio, pp.ordencompra))
+
+    return RunState(
+        last_run=datetime.fromisoformat(meta["last_run"]),
+        totals_by_seller=meta["totals_by_seller"],
+        processed_purchases=processed_purchases,
+        # rewrite the log on save instead of appending after a torn line
+        logged_purchases=0 if torn_tail else len(processed_purchases),
+        processed_keys=processed_keys,
+    )
+
+
+def write_state_log(state: RunState):
+    """
+    Rewrite STATE_LOG_FILE from scratch with the processed purchases in `state`
+    """
+    logger.info("Compacting %s", STATE_LOG_FILE)
+    tmp_fname = STATE_LOG_FILE + ".tmp"
+    with open(tmp_fname, "w") as lf:
+        for pp in state.processed_purchases:
+            lf.write(processed_purchase_to_json(pp) + "\n")
+    os.replace(tmp_fname, STATE_LOG_FILE)
+
+
 def save_state(state: RunState):
     logger.info("Saving new state")
-    with open(STATE_FILE, "wb") as sf:
-        pickle.dump(state, sf)
+    # only purchases from the current fiscal year are fetched, older ones
+    # can't come up again
+    kept = [
+        pp for pp in state.processed_purchases if pp.ejercicio >= CURRENT_YEAR - 1
+    ]
+    if len(kept) < len(state.processed_purchases):
+        logger.info(
+            "Trimming %d processed purchases older than %d",
+            len(state.processed_purchases) - len(kept),
+            CURRENT_YEAR - 1,
+        )
+        state.processed_purchases = kept
+        state.processed_keys = {(pp.ejercicio, pp.ordencompra) for pp in kept}
+        state.logged_purchases = 0
+
+    if state.logged_purchases == 0:
+        write_state_log(state)
+    else:
+        with open(STATE_LOG_FILE, "a") as lf:
+            for pp in state.processed_purchases[state.logged_purchases :]:
+                lf.write(processed_purchase_to_json(pp) + "\n")
+    state.logged_purchases = len(state.processed_purchases)
+
+    tmp_fname = STATE_META_FILE + ".tmp"
+    with open(tmp_fname, "w") as mf:
+        json.dump(
+            {
+                "last_run": state.last_run.isoformat(),
+                "totals_by_seller": state.totals_by_seller,
+            },
+            mf,
+        )
+    os.replace(tmp_fname, STATE_META_FILE)
 
 
 def main():
@@ -262,19 +510,17 @@ def main():
     logger.info(
         (
             "Read state. last_run: %s - "
-            "len(totals_by_seller): %d - len(all_purchases): %d - "
+            "len(totals_by_seller): %d - "
             "len(processed_purchases): %d"
         ),
         state.last_run,
         len(state.totals_by_seller),
-        len(state.all_purchases),
         len(state.processed_purchases),
     )
     prev_run = state.last_run
-    state.last_run = datetime.now()
+    now = datetime.now()
+    state.last_run = now
 
-    logger.info("Getting all purchases")
-    state.all_purchases = get_all_purchases()
     logger.info("Getting ad purchases")
     ad_purchases_totals = get_advertisement_totals_by_seller()
 
@@ -286,59 +532,66 @@ def main():
         logger.info("No changes since %s - Bye.", prev_run)
         save_state(state)
         sys.exit(0)
-    
+
+    logger.info("Getting all purchases")
+    all_purchases = get_all_purchases()
 
     twitter_client = init_twitter_client()
     tweet_queue: List[Purchase] = []
+    by_seller = purchases_by_seller(all_purchases)
 
+    candidates: List[Purchase] = []
     for seller in sellers_to_process:
         purchases_to_process = get_unprocessed_purchases_for_seller(
-            state.all_purchases, state.processed_purchases, seller
+            by_seller, state.processed_keys, seller
         )
         for p in purchases_to_process:
-            logger.info("Processing purchase: %s", p)
-            logger.info("Getting detail for %s/%s", p.ejercicio, p.ordencompra)
-            try:
-                purchase_detail = get_purchase_detail(purchase_detail_url(p))
-            except Exception as e:
-                logger.warn("Error when getting detail of %s. Exception: %s", p, e)
-                state.processed_purchases.append(
-                    ProcessedPurchase(
-                        **p.to_dict(),
-                        processed_at=datetime.now(),
-                        status="error",
-                        tweet_id=None,
-                    )
-                )
+            if (p.ejercicio, p.ordencompra) in state.processed_keys:
+                # same PO listed more than once, its detail is already queued
                 continue
-
-            if not any(
-                map(
-                    lambda line: KEYWORD_TO_CHECK in line["detalle"].lower(),
-                    purchase_detail,
+            logger.info("Processing purchase: %s", p)
+            candidates.append(p)
+            # every candidate ends up in processed_purchases below
+            state.processed_keys.add((p.ejercicio, p.ordencompra))
+
+    for p, has_keyword, error in check_purchase_details(candidates):
+        if error is not None:
+            logger.warn("Error when getting detail of %s. Exception: %s", p, error)
+            state.processed_purchases.append(
+                ProcessedPurchase(
+                    **dataclasses.asdict(p),
+                    processed_at=now,
+                    status="error",
+                    tweet_id=None,
                 )
-            ):
-                logger.info("Dropping %s - keyword not found")
-                state.processed_purchases.append(
-                    ProcessedPurchase(
-                        **p.to_dict(),
-                        processed_at=datetime.now(),
-                        status="dropped",
-                        tweet_id=None,
-                    )
+            )
+            continue
+
+        if not has_keyword:
+            logger.info("Dropping %s - keyword not found", p)
+            state.processed_purchases.append(
+                ProcessedPurchase(
+                    **dataclasses.asdict(p),
+                    processed_at=now,
+                    status="dropped",
+                    tweet_id=None,
                 )
-                continue
-            logger.info("Will tweet: %s", p)
-            tweet_queue.append(p)
+            )
+            continue
+        logger.info("Will tweet: %s", p)
+        tweet_queue.append(p)
 
-    for i, p in enumerate(
-        sorted(tweet_queue, key=lambda p: datetime.strptime(p.fecha, "%d-%m-%Y"))
-    ):
+    tweet_queue.sort(key=lambda p: parse_fecha(p.fecha))
+    screenshots = get_purchase_screenshots(tweet_queue)
+
+    for p, screenshot_path in zip(tweet_queue, screenshots):
         tweet_id: str = ""
         status: str = ""
         logger.info("Tweeting: %s", p)
         try:
-            status = tweet_new_purchase(p, twitter_client)
+            status = tweet_new_purchase(
+                p, twitter_client, screenshot_path=screenshot_path
+            )
             tweet_id = status.id
             status = "processed"
         except Exception as e:
@@ -348,8 +601,8 @@ def main():
 
         state.processed_purchases.append(
             ProcessedPurchase(
-                **p.to_dict(),
-                processed_at=datetime.now(),
+                **dataclasses.asdict(p),
+                processed_at=now,
                 status=status,
                 tweet_id=tweet_id,
             )
@@ -385,11 +638,7 @@ def tweet_purchase(po_number: int, po_year: int):
     purchase = ps[0]
     tweet_body = tweet_body_for_purchase(purchase)
     api = init_twitter_client()
-    screenshot_path = get_microlink_screenshot(
-        DETAIL_PURCHASE_PAGE_URL_TEMPLATE.format(
-            year=purchase.ejercicio, ordencompra=purchase.ordencompra
-        )
-    )
+    screenshot_path = get_purchase_screenshot(purchase)
 
     api.update_with_media(screenshot_path, status=tweet_body)
 